@@ -1,139 +1,14 @@
-# from fastapi import FastAPI
-# from pydantic import BaseModel
-# from typing import List, Optional
-# import re
-# import json
-
-# app = FastAPI(title="S4HANA Credit Management Object Remediator")
-
-# # Mapping of obsolete objects to replacements
-# REPLACEMENTS = {
-#     "S066": "Replace S066 table with relevant fields of UKM_ITEM (per SAP Note 2706489)",
-#     "S067": "Replace S067 table with relevant fields of UKM_ITEM (per SAP Note 2706489)",
-#     "SD_VKMLOG_SHOW": "This is obsolete",
-#     "VAKCR_REBUILD": "This is obsolete",
-#     "RVKRED03": "This is obsolete",
-#     "RVKRED04": "This is obsolete",
-#     "RVKRED05": "This is obsolete",
-#     "VKMI": "This is obsolete",
-#     "VAKCR": "This is obsolete",
-#     "VKM2": "Replace with UKM_CASE (OSS Note 2270544)",
-#     "VKM3": "Replace with UKM_CASE (OSS Note 2270544)",
-#     "VKM5": "Replace with UKM_CASE (OSS Note 2270544)",
-#     "CL_CRED_VAL_LOG": "This is obsolete",
-# }
-
-# # Categorise by ABAP usage context
-# TABLES = ["S066", "S067", "VKMI", "VAKCR"]
-# TRANSACTIONS = ["VKM2", "VKM3", "VKM5"]
-# PROGRAMS = ["SD_VKMLOG_SHOW", "VAKCR_REBUILD", "RVKRED03", "RVKRED04", "RVKRED05"]
-# CLASSES = ["CL_CRED_VAL_LOG"]
-
-# # Regex patterns for structured statements
-# TABLE_RE = re.compile(
-#     rf"(?P<full>(?P<stmt>\bSELECT\b|\bINSERT\b|\bUPDATE\b|\bDELETE\b|\bMODIFY\b)[\s\S]*?\b(FROM|INTO|UPDATE|DELETE\s+FROM)\b\s+(?P<obj>{'|'.join(TABLES)})\b[\s\S]*?\.)",
-#     re.IGNORECASE,
-# )
-
-# TXN_RE = re.compile(
-#     rf"(?P<full>(?P<stmt>\bCALL\s+TRANSACTION\b)\s+['\"]?(?P<obj>{'|'.join(TRANSACTIONS)})['\"]?\s*\.)",
-#     re.IGNORECASE,
-# )
-
-# PROG_RE = re.compile(
-#     rf"(?P<full>(?P<stmt>\bSUBMIT\b)\s+(?P<obj>{'|'.join(PROGRAMS)})\b[\s\S]*?\.)",
-#     re.IGNORECASE,
-# )
-
-# CLASS_RE = re.compile(
-#     rf"(?P<full>(?P<stmt>\bCREATE\s+OBJECT\b|\bNEW\b|\bTYPE\s+REF\s+TO\b)[\s\S]*?\b(?P<obj>{'|'.join(CLASSES)})\b[\s\S]*?\.)",
-#     re.IGNORECASE,
-# )
-
-# # CLEAR statements
-# CLEAR_RE = re.compile(
-#     rf"(?P<full>(?P<stmt>\bCLEAR\b)[\s\S]*?\b(?P<obj>{'|'.join(TABLES)})[\w\-]*\s*\.)",
-#     re.IGNORECASE,
-# )
-
-# # Assignments with obsolete tables
-# ASSIGN_RE = re.compile(
-#     rf"(?P<full>((?P<obj>{'|'.join(TABLES)})[\w\-]*\s*=\s*[\w\-\>]+|[\w\-\>]+\s*=\s*(?P<obj2>{'|'.join(TABLES)})[\w\-]*)\s*\.)",
-#     re.IGNORECASE,
-# )
-
-# # Catch-all generic matcher (any use of S066/S067 in code)
-# GENERIC_RE = re.compile(
-#     rf"(?P<full>(?P<obj>{'|'.join(TABLES)})[\-\w]*)",
-#     re.IGNORECASE,
-# )
-
-# # All matchers
-# FINDERS = [TABLE_RE, TXN_RE, PROG_RE, CLASS_RE, CLEAR_RE, ASSIGN_RE, GENERIC_RE]
-
-
-# class Unit(BaseModel):
-#     pgm_name: str
-#     inc_name: str
-#     type: str
-#     name: Optional[str] = None
-#     class_implementation: Optional[str] = None
-#     start_line: Optional[int] = None
-#     end_line: Optional[int] = None
-#     code: Optional[str] = ""
-
-
-# def find_obsolete_usage(txt: str):
-#     seen = set()
-#     matches = []
-#     for pat in FINDERS:
-#         for m in pat.finditer(txt or ""):
-#             span = m.span("full")
-#             if span in seen:  # avoid duplicates
-#                 continue
-#             seen.add(span)
-
-#             obj = m.groupdict().get("obj") or m.groupdict().get("obj2")
-#             matches.append({
-#                 "full": m.group("full"),
-#                 "stmt": m.groupdict().get("stmt") or "=",
-#                 "object": obj,
-#                 "suggested_statement": REPLACEMENTS.get(obj.upper()) if obj else None,
-#                 "span": span,
-#                 "snippet": m.group("full").strip()
-#             })
-#     matches.sort(key=lambda x: x["span"][0])
-#     return matches
-
-
-# @app.post("/remediate-credit-objects")
-# def remediate_credit_objects(units: List[Unit]):
-#     results = []
-#     for u in units:
-#         src = u.code or ""
-#         metadata = []
-#         for m in find_obsolete_usage(src):
-#             metadata.append({
-#                 "table": None,
-#                 "target_type": "TABLE" if m["object"] in TABLES else None,
-#                 "target_name": m["object"],
-#                 "start_char_in_unit": m["span"][0],
-#                 "end_char_in_unit": m["span"][1],
-#                 "used_fields": [],
-#                 "ambiguous": m["suggested_statement"] is None,
-#                 "suggested_statement": m["suggested_statement"],
-#                 "suggested_fields": None,
-#                 "snippet": m["snippet"],
-#             })
-#         obj = json.loads(u.model_dump_json())
-#         obj["mb_txn_usage"] = metadata
-#         results.append(obj)
-#     return results
 from fastapi import FastAPI
 from pydantic import BaseModel
 from typing import List, Optional
-import re
-import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+import re2
 
 app = FastAPI(title="S4HANA Credit Management Object Remediator")
 
@@ -159,39 +34,60 @@ TABLES = ["S066", "S067", "VKMI", "VAKCR"]
 TRANSACTIONS = ["VKM2", "VKM3", "VKM5"]
 PROGRAMS = ["SD_VKMLOG_SHOW", "VAKCR_REBUILD", "RVKRED03", "RVKRED04", "RVKRED05"]
 CLASSES = ["CL_CRED_VAL_LOG"]
+TABLES_SET = frozenset(TABLES)
 
-# Context-aware regex patterns
-TABLE_RE = re.compile(
-    rf"(?P<full>(?P<stmt>\bSELECT\b|\bINSERT\b|\bUPDATE\b|\bDELETE\b|\bMODIFY\b)[\s\S]*?\b(FROM|INTO|UPDATE|DELETE\s+FROM)\b\s+(?P<obj>{'|'.join(TABLES)})\b)",
-    re.IGNORECASE,
-)
-TXN_RE = re.compile(
-    rf"(?P<full>(?P<stmt>\bCALL\s+TRANSACTION\b)\s+['\"]?(?P<obj>{'|'.join(TRANSACTIONS)})['\"]?)",
-    re.IGNORECASE,
-)
-PROG_RE = re.compile(
-    rf"(?P<full>(?P<stmt>\bSUBMIT\b)\s+(?P<obj>{'|'.join(PROGRAMS)})\b)",
-    re.IGNORECASE,
-)
-CLASS_RE = re.compile(
-    rf"(?P<full>(?P<stmt>\bCREATE\s+OBJECT\b|\bNEW\b|\bTYPE\s+REF\s+TO\b)[\s\S]*?\b(?P<obj>{'|'.join(CLASSES)})\b)",
-    re.IGNORECASE,
-)
-
-# NEW: CLEAR statements like "CLEAR S066." or "CLEAR S067-variable."
-CLEAR_RE = re.compile(
-    rf"(?P<full>(?P<stmt>\bCLEAR\b)\s+(?P<obj>{'|'.join(TABLES)})\b[\w\-]*)",
-    re.IGNORECASE,
-)
-
-# NEW: "=" assignments involving table names (either side of '=')
-ASSIGN_RE = re.compile(
-    rf"(?P<full>(?P<obj>{'|'.join(TABLES)})[\w\-]*\s*=\s*[\w\-\>]+|[\w\-\>]+\s*=\s*(?P<obj2>{'|'.join(TABLES)})[\w\-]*)",
-    re.IGNORECASE,
-)
-
-# All patterns to search
-FINDERS = [TABLE_RE, TXN_RE, PROG_RE, CLASS_RE, CLEAR_RE, ASSIGN_RE]
+# Lowercased bytes as matched -> the one canonical str for each name
+CANONICAL_NAMES = {
+    n.lower().encode(): sys.intern(n) for n in TABLES + TRANSACTIONS + PROGRAMS + CLASSES
+}
+
+# Gap between a statement keyword and the object. ABAP statements end at
+# ".", so the gap never pairs a keyword with an object in a later
+# statement. RE2 matches in linear time, so no length cap is needed; a
+# counted repeat would be unrolled and exhaust RE2's DFA memory.
+GAP = r"[^.]*?"
+
+def _build_patterns(engine=re2):
+    # Context-aware regex patterns, one named alternative per usage kind.
+    # Inner groups carry the kind as suffix since group names must be unique.
+    # Patterns are lowercase bytes and run against the lowercased ASCII source.
+    tables = "|".join(TABLES).lower()
+    transactions = "|".join(TRANSACTIONS).lower()
+    programs = "|".join(PROGRAMS).lower()
+    classes = "|".join(CLASSES).lower()
+
+    table_re = rf"(?P<k_table>(?P<stmt_table>\bselect\b|\binsert\b|\bupdate\b|\bdelete\b|\bmodify\b){GAP}\b(from|into|update|delete\s+from)\b\s+(?P<obj_table>{tables})\b)"
+    txn_re = rf"(?P<k_txn>(?P<stmt_txn>\bcall\s+transaction\b)\s+['\"]?(?P<obj_txn>{transactions})['\"]?)"
+    prog_re = rf"(?P<k_prog>(?P<stmt_prog>\bsubmit\b)\s+(?P<obj_prog>{programs})\b)"
+    class_re = rf"(?P<k_class>(?P<stmt_class>\bcreate\s+object\b|\bnew\b|\btype\s+ref\s+to\b){GAP}\b(?P<obj_class>{classes})\b)"
+
+    # CLEAR statements like "CLEAR S066." or "CLEAR S067-variable."
+    clear_re = rf"(?P<k_clear>(?P<stmt_clear>\bclear\b)\s+(?P<obj_clear>{tables})\b[\w\-]*)"
+
+    # "=" assignments involving table names (either side of '=')
+    assign_re = rf"(?P<k_assign>(?P<obj_assign>{tables})[\w\-]*\s*=\s*[\w\-\>]+|[\w\-\>]+\s*=\s*(?P<obj2_assign>{tables})[\w\-]*)"
+
+    # All finders fused into one alternation so the source is scanned once;
+    # RE2 runs it in linear time
+    finders = (table_re, txn_re, prog_re, class_re, clear_re, assign_re)
+    return engine.compile("|".join(finders).encode())
+
+# Compiled exactly once at import
+COMBINED = _build_patterns()
+
+# re2 keys groupindex by bytes for bytes patterns
+_GROUPS = {k.decode(): v for k, v in COMBINED.groupindex.items()}
+
+# Outer group index of each kind -> index of the group holding its object
+# (assignments can capture it on either side of '=')
+_OBJ_GROUP = {}
+for _name, _idx in _GROUPS.items():
+    if _name.startswith("k_"):
+        _obj = _GROUPS["obj_" + _name[2:]]
+        _OBJ_GROUP[_idx] = (_obj, _GROUPS.get("obj2_" + _name[2:], _obj))
+
+# Bounded pool for per-unit work so large batches don't block the event loop
+EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
 
 
 class Unit(BaseModel):
@@ -210,44 +106,71 @@ def snippet_at(text: str, start: int, end: int) -> str:
     e = min(len(text), end + 60)
     return text[s:e].replace("\n", "\\n")
 
-def find_obsolete_usage(txt: str):
-    matches = []
-    for pat in FINDERS:
-        for m in pat.finditer(txt or ""):
-            obj = m.groupdict().get("obj") or m.groupdict().get("obj2")
-            matches.append({
-                "full": m.group("full"),
-                "stmt": m.groupdict().get("stmt") or "=",
-                "object": obj,
-                "suggested_statement": REPLACEMENTS.get(obj.upper()) if obj else None,
-                "span": m.span("full"),
-            })
-    matches.sort(key=lambda x: x["span"][0])
-    return matches
-
+def lowered(txt: str) -> bytes:
+    # ABAP source is ASCII; any other character becomes one "?" byte, so
+    # byte offsets equal character offsets in the original text
+    return txt.encode("ascii", "replace").lower()
 
+def find_obsolete_usage(txt: str):
+    if not txt:
+        return
+    for m in COMBINED.finditer(lowered(txt)):
+        obj_idx, alt_idx = _OBJ_GROUP[m.lastindex]
+        obj = CANONICAL_NAMES[m.group(obj_idx) or m.group(alt_idx)]
+        start, end = m.span()
+        suggested = REPLACEMENTS.get(obj)
+        yield {
+            "table": None,
+            "target_type": "TABLE" if obj in TABLES_SET else None,
+            "target_name": obj,
+            "start_char_in_unit": start,
+            "end_char_in_unit": end,
+            "used_fields": [],
+            "ambiguous": suggested is None,
+            "suggested_statement": suggested,
+            "suggested_fields": None,
+            "snippet": snippet_at(txt, start, end),
+        }
+
+# Generated includes are often sent again unchanged; reuse their findings.
+# Entries are keyed by a digest so the source text itself is not retained.
+# The bound is on entry count, and each entry keeps its findings, so a unit
+# with many hits can still cost more memory than its own text.
+CACHE_SIZE = 1024
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def find_obsolete_usage_cached(txt: str):
+    key = hashlib.blake2b(txt.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _cache_lock:
+        found = _cache.get(key)
+        if found is not None:
+            _cache.move_to_end(key)
+            return found
+    found = tuple(find_obsolete_usage(txt))
+    with _cache_lock:
+        _cache[key] = found
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return found
+
+
+def _process_unit(u: Unit) -> dict:
+    obj = u.model_dump()
+    obj["mb_txn_usage"] = list(find_obsolete_usage_cached(u.code))
+    return obj
+
+
+# The declared return type lets FastAPI serialize the rows straight to JSON
+# bytes through Pydantic, skipping the jsonable_encoder walk
 @app.post("/remediate-credit-objects")
-def remediate_credit_objects(units: List[Unit]):
-    results = []
-    for u in units:
-        src = u.code or ""
-        metadata = []
-        for m in find_obsolete_usage(src):
-            start, end = m["span"]
-            metadata.append({
-                "table": None,
-                "target_type": "TABLE" if m["object"] in TABLES else None,
-                "target_name": m["object"],
-                "start_char_in_unit": m["span"][0],
-                "end_char_in_unit": m["span"][1],
-                "used_fields": [],
-                "ambiguous": m["suggested_statement"] is None,
-                "suggested_statement": m["suggested_statement"],
-                "suggested_fields": None,
-                "snippet": snippet_at(src, start, end)
-                # "note": "Replace obsolete MB transactio
-            })
-        obj = json.loads(u.model_dump_json())
-        obj["mb_txn_usage"] = metadata
-        results.append(obj)
-    return results
+async def remediate_credit_objects(units: List[Unit]) -> List[dict]:
+    loop = asyncio.get_running_loop()
+    scanned = iter(await asyncio.gather(*[
+        loop.run_in_executor(EXECUTOR, _process_unit, u) for u in units if u.code
+    ]))
+    # Header stubs and empty includes have nothing to scan; answer them inline
+    return [
+        next(scanned) if u.code else {**u.model_dump(), "mb_txn_usage": []}
+        for u in units
+    ]
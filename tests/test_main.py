@@ -0,0 +1,138 @@
+import asyncio
+import re
+
+from app import main
+from app.main import COMBINED, Unit, _build_patterns, lowered, remediate_credit_objects
+
+# One statement per finder kind, with the object upper-cased as SAP writes it
+SAMPLE = (
+    "SELECT * FROM S066 INTO TABLE lt_tab.\n"
+    "CALL TRANSACTION 'VKM2'.\n"
+    "SUBMIT RVKRED03 AND RETURN.\n"
+    "DATA lo TYPE REF TO CL_CRED_VAL_LOG.\n"
+    "CLEAR S067-FIELD.\n"
+    "lv_x = VAKCR-AMOUNT.\n"
+)
+
+# A wide field list puts well over 1000 characters between SELECT and FROM
+LONG_SELECT = (
+    "SELECT "
+    + " ".join(f"s066~field_{i:03}" for i in range(90))
+    + " FROM s066 INTO TABLE lt."
+)
+
+# Inputs the fused pattern must match identically under RE2 and stdlib re
+ENGINE_SAMPLES = [
+    SAMPLE,
+    SAMPLE.lower(),
+    "select\n  a\n  b\n  from s066\n  into table @data(lt).",
+    LONG_SELECT,
+    "SELECT * FROM mara. DELETE FROM vkmi WHERE x = 1. CREATE OBJECT lo TYPE cl_cred_val_log.",
+]
+
+
+def remediate(*codes):
+    units = [
+        Unit(pgm_name="ZPROG", inc_name=f"ZINC{i}", type="PROG", code=code)
+        for i, code in enumerate(codes)
+    ]
+    return asyncio.run(remediate_credit_objects(units))
+
+
+def test_each_finder_kind_reports_its_object():
+    [unit] = remediate(SAMPLE)
+    rows = [
+        (r["target_name"], r["target_type"], SAMPLE[r["start_char_in_unit"]:r["end_char_in_unit"]])
+        for r in unit["mb_txn_usage"]
+    ]
+    assert rows == [
+        ("S066", "TABLE", "SELECT * FROM S066"),
+        ("VKM2", None, "CALL TRANSACTION 'VKM2'"),
+        ("RVKRED03", None, "SUBMIT RVKRED03"),
+        ("CL_CRED_VAL_LOG", None, "TYPE REF TO CL_CRED_VAL_LOG"),
+        ("S067", "TABLE", "CLEAR S067-FIELD"),
+        ("VAKCR", "TABLE", "lv_x = VAKCR-AMOUNT"),
+    ]
+    assert unit["mb_txn_usage"][0]["start_char_in_unit"] == 0
+    assert unit["mb_txn_usage"][-1]["end_char_in_unit"] == SAMPLE.index("-AMOUNT") + len("-AMOUNT")
+    assert all(not r["ambiguous"] and r["suggested_statement"] for r in unit["mb_txn_usage"])
+    assert unit["code"] == SAMPLE
+
+
+def test_units_without_obsolete_objects_report_nothing():
+    units = remediate(
+        "WRITE 'hello'.",
+        "PERFORM x IN PROGRAM vakcr_rebuild.",
+        "DATA lt TYPE TABLE OF s066_custom.",
+        "lv = 'S0661'.",
+        "",
+    )
+    assert [u["mb_txn_usage"] for u in units] == [[]] * 5
+
+
+def test_re2_agrees_with_stdlib_re():
+    stdlib = _build_patterns(re)
+    for src in ENGINE_SAMPLES:
+        low = lowered(src)
+        expected = [(m.span(), m.lastindex) for m in stdlib.finditer(low)]
+        assert expected
+        assert [(m.span(), m.lastindex) for m in COMBINED.finditer(low)] == expected
+
+
+def test_lowercase_source_reports_canonical_names():
+    [unit] = remediate(SAMPLE.lower())
+    assert [(r["target_name"], r["target_type"]) for r in unit["mb_txn_usage"]] == [
+        ("S066", "TABLE"),
+        ("VKM2", None),
+        ("RVKRED03", None),
+        ("CL_CRED_VAL_LOG", None),
+        ("S067", "TABLE"),
+        ("VAKCR", "TABLE"),
+    ]
+
+
+def test_statement_gap_stays_within_one_statement():
+    [unit] = remediate(LONG_SELECT)
+    rows = [(r["target_name"], r["start_char_in_unit"], r["end_char_in_unit"]) for r in unit["mb_txn_usage"]]
+    assert rows == [("S066", 0, LONG_SELECT.index(" INTO"))]
+
+    [unit] = remediate("SELECT * FROM mara.\nlv_count = 1 + 2 FROM s066.")
+    assert unit["mb_txn_usage"] == []
+
+
+def test_cache_is_keyed_by_digest_and_bounded(monkeypatch):
+    monkeypatch.setattr(main, "CACHE_SIZE", 2)
+    main._cache.clear()
+    sources = [f"SELECT * FROM s066 WHERE id = {i}." for i in range(4)]
+    for src in sources:
+        assert main.find_obsolete_usage_cached(src) == tuple(main.find_obsolete_usage(src))
+    assert len(main._cache) == 2
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in main._cache)
+    assert main.find_obsolete_usage_cached(sources[-1]) is main.find_obsolete_usage_cached(sources[-1])
+
+
+def test_offsets_index_the_original_text_with_non_ascii_source():
+    # "\u0130".lower() is two characters long; "\u00e4" is one
+    prefix = "* Prüfung \u0130\u0130 \u00c4nderung\n"
+    src = prefix + SAMPLE
+    [unit] = remediate(src)
+    rows = unit["mb_txn_usage"]
+    assert [src[r["start_char_in_unit"]:r["end_char_in_unit"]] for r in rows][:2] == [
+        "SELECT * FROM S066",
+        "CALL TRANSACTION 'VKM2'",
+    ]
+    assert rows[0]["start_char_in_unit"] == len(prefix)
+
+
+def test_response_order_with_mixed_code_and_empty_units():
+    units = remediate("", SAMPLE, None, "WRITE 'x'.", "", "CALL TRANSACTION 'VKM3'.")
+    assert [u["inc_name"] for u in units] == [f"ZINC{i}" for i in range(6)]
+    assert [u["code"] for u in units] == ["", SAMPLE, None, "WRITE 'x'.", "", "CALL TRANSACTION 'VKM3'."]
+    assert [[r["target_name"] for r in u["mb_txn_usage"]] for u in units] == [
+        [],
+        ["S066", "VKM2", "RVKRED03", "CL_CRED_VAL_LOG", "S067", "VAKCR"],
+        [],
+        [],
+        [],
+        ["VKM3"],
+    ]